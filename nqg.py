@@ -1,19 +1,30 @@
 #!/usr/bin/env python3
 import os
+import errno
+import fcntl
+import hashlib
 import json
 import subprocess
 import shutil
+import socket
+import functools
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import urllib.parse
 import logging
 import re
 import gi
 gi.require_version('Gtk', '3.0')
-from gi.repository import Gtk, Gdk, GLib
+from gi.repository import Gtk, Gdk, GLib, Gio
 import webbrowser
 import psutil
-import time
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
+@functools.lru_cache(maxsize=None)
 def find_ovmf_source_dir():
     candidates = [
         "/usr/share/edk2-ovmf/x64",
@@ -25,45 +36,121 @@ def find_ovmf_source_dir():
         "/usr/share/qemu",
         "/usr/share/edk2"
     ]
-    patterns = [r"^OVMF", r"OVMF_CODE", r"OVMF_VARS", r"secboot", r"secureboot", r"4m\.fd"]
+    pattern = re.compile(r"^OVMF|OVMF_CODE|OVMF_VARS|secboot|secureboot|4m\.fd", re.IGNORECASE)
     for d in candidates:
-        if os.path.isdir(d):
-            files = os.listdir(d)
-            for f in files:
-                for p in patterns:
-                    if re.search(p, f, re.IGNORECASE):
-                        return d
+        try:
+            with os.scandir(d) as it:
+                if any(pattern.search(entry.name) for entry in it):
+                    return d
+        except OSError:
+            continue
     return None
 
 CONFIG_DIR = os.path.join(os.path.expanduser("~"), ".nqg")
-if not os.path.exists(CONFIG_DIR):
-    os.makedirs(CONFIG_DIR)
+os.makedirs(CONFIG_DIR, exist_ok=True)
 CONFIG_FILE = os.path.join(CONFIG_DIR, "vms_index.json")
 LOG_FILE = os.path.join(CONFIG_DIR, "nqg.log")
+RUNTIME_DIR = os.environ.get("XDG_RUNTIME_DIR") or "/tmp"
+RESUME_SNAPSHOT = "nqg-resume"
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 logging.basicConfig(filename=LOG_FILE, level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def get_host_os():
-    if os.path.exists("/etc/arch-release"):
-        return "arch"
-    elif os.path.exists("/etc/debian_version"):
-        return "debian"
-    elif os.path.exists("/etc/fedora-release"):
-        return "fedora"
-    elif os.path.exists("/etc/serpentos-release"):
-        return "serpentos"
-    else:
-        return "other"
+CSS = b"""
+window { background-color: #1e1e2e; }
+.vm-item { background-color: #2c2c3c; border-radius: 8px; padding: 12px; margin: 4px; color: #ffffff; box-shadow: 0 2px 4px rgba(0,0,0,0.2); }
+.round-button { border-radius: 50%; padding: 4px; background-color: transparent; background-image: none; border-color: transparent; box-shadow: none; }
+.iso-drop-area { background-color: #3b3b4b; border: 2px dashed #ffffff; }
+.snapshot-button { background-color: #3b3b4b; color: #ffffff; border-radius: 4px; padding: 4px 8px; }
+.snapshot-button:hover { background-color: #4c4c5c; }
+"""
+
+@functools.lru_cache(maxsize=None)
+def iso_filter():
+    f = Gtk.FileFilter()
+    f.set_name("ISO Files")
+    f.add_pattern("*.iso")
+    return f
+
+@functools.lru_cache(maxsize=None)
+def which(name):
+    return shutil.which(name)
+
+FAST_COPY_FALLBACK_ERRNOS = (errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF, errno.ENOTTY)
+FICLONE = 0x40049409
+FAST_COPY_CHUNK = 64 * 1024 * 1024
+
+def fast_copy(src, dst, progress=None):
+    try:
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            infd = fsrc.fileno()
+            outfd = fdst.fileno()
+            size = os.fstat(infd).st_size
+            copied = 0
+            try:
+                fcntl.ioctl(outfd, FICLONE, infd)
+                copied = size
+            except OSError as e:
+                if e.errno not in FAST_COPY_FALLBACK_ERRNOS:
+                    raise
+            try:
+                while copied < size:
+                    n = os.copy_file_range(infd, outfd, min(size - copied, FAST_COPY_CHUNK), copied)
+                    if not n:
+                        break
+                    copied += n
+                    if progress:
+                        progress(copied, size)
+            except OSError as e:
+                if e.errno not in FAST_COPY_FALLBACK_ERRNOS:
+                    raise
+            try:
+                while copied < size:
+                    n = os.sendfile(outfd, infd, copied, min(size - copied, FAST_COPY_CHUNK))
+                    if not n:
+                        break
+                    copied += n
+                    if progress:
+                        progress(copied, size)
+            except OSError as e:
+                if e.errno not in FAST_COPY_FALLBACK_ERRNOS:
+                    raise
+            fsrc.seek(copied)
+            buf = bytearray(262144)
+            view = memoryview(buf)
+            while True:
+                n = fsrc.readinto(buf)
+                if not n:
+                    break
+                fdst.write(view[:n])
+                copied += n
+                if progress:
+                    progress(copied, size)
+            if progress:
+                progress(size, size)
+    except BaseException:
+        if os.path.exists(dst):
+            os.remove(dst)
+        raise
+    shutil.copymode(src, dst)
+
+_ovmf_cache = {}
+
+def is_current_copy(src, dst):
+    try:
+        s, d = os.stat(src), os.stat(dst)
+    except OSError:
+        return False
+    return s.st_size == d.st_size and d.st_mtime_ns >= s.st_mtime_ns
 
-def copy_uefi_files(config, parent_window=None):
-    host_os = get_host_os()
-    ovmf_dir = os.path.join(config["path"], "ovmf")
-    os.makedirs(ovmf_dir, exist_ok=True)
+def ensure_ovmf_files(ovmf_dir, secure, parent_window=None):
+    cached = _ovmf_cache.get((ovmf_dir, secure))
+    if cached and os.path.exists(cached[0]) and os.path.exists(cached[1]):
+        return cached
     src_dir = find_ovmf_source_dir()
     if not src_dir:
         GLib.idle_add(show_detailed_error_dialog, "OVMF folder not found.", "No valid OVMF source directory detected. Please install 'edk2-ovmf' or 'edk2'.", parent_window)
-        return False
+        return None
 
     files = os.listdir(src_dir)
     code_candidates = []
@@ -86,69 +173,112 @@ def copy_uefi_files(config, parent_window=None):
     chosen_vars = choose_first(vars_candidates)
     chosen_secboot = choose_first(secboot_code_candidates)
 
-    firmware = config.get("firmware", "")
-    code_src_name = None
-    vars_src_name = None
-
-    if firmware == "UEFI+Secure Boot":
-        if chosen_secboot:
-            code_src_name = chosen_secboot
-        elif chosen_code:
-            code_src_name = chosen_code
-        else:
-            code_src_name = None
-        vars_src_name = chosen_vars
+    if secure:
+        code_src_name = chosen_secboot or chosen_code
     else:
-        if chosen_code:
-            code_src_name = chosen_code
-        else:
-            if chosen_secboot:
-                code_src_name = chosen_secboot
-        vars_src_name = chosen_vars
+        code_src_name = chosen_code or chosen_secboot
+    vars_src_name = chosen_vars
 
     if not code_src_name or not vars_src_name:
         available = "\n".join(files)
         GLib.idle_add(show_detailed_error_dialog, "UEFI source files not found.", f"Could not locate suitable OVMF CODE and VARS files in {src_dir}. Available files:\n{available}", parent_window)
-        return False
+        return None
+
+    dst_code = f"{ovmf_dir}/{code_src_name}"
+    dst_vars = f"{ovmf_dir}/{vars_src_name}"
+    src_code = f"{src_dir}/{code_src_name}"
+    src_vars = f"{src_dir}/{vars_src_name}"
+
+    copies = []
+    if not is_current_copy(src_code, dst_code):
+        copies.append((src_code, dst_code, f"code file: {code_src_name}"))
+    if not os.path.exists(dst_vars):
+        copies.append((src_vars, dst_vars, f"vars file: {vars_src_name}"))
+    failures = []
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futures = {pool.submit(fast_copy, src, dst): (src, dst, name) for src, dst, name in copies}
+        for future in as_completed(futures):
+            src, dst, name = futures[future]
+            try:
+                future.result()
+                logging.info(f"Copied {src} to {dst}")
+            except Exception as e:
+                logging.error(f"Copy failed {src} to {dst}: {e}")
+                failures.append((name, str(e)))
+    if failures:
+        GLib.idle_add(show_detailed_error_dialog, f"Failed to copy UEFI {failures[0][0]}", "\n".join(e for _, e in failures), parent_window)
+        return None
 
-    dst_code = os.path.join(ovmf_dir, os.path.basename(code_src_name))
-    dst_vars = os.path.join(ovmf_dir, os.path.basename(vars_src_name))
-    src_code = os.path.join(src_dir, code_src_name)
-    src_vars = os.path.join(src_dir, vars_src_name)
+    _ovmf_cache[(ovmf_dir, secure)] = (dst_code, dst_vars)
+    return dst_code, dst_vars
 
-    try:
-        shutil.copy(src_code, dst_code)
-        logging.info(f"Copied {src_code} to {dst_code}")
-    except Exception as e:
-        logging.error(f"Copy failed {src_code} to {dst_code}: {e}")
-        GLib.idle_add(show_detailed_error_dialog, f"Failed to copy UEFI code file: {code_src_name}", str(e), parent_window)
-        return False
+_ensured_dirs = set()
 
-    try:
-        shutil.copy(src_vars, dst_vars)
-        logging.info(f"Copied {src_vars} to {dst_vars}")
-    except Exception as e:
-        logging.error(f"Copy failed {src_vars} to {dst_vars}: {e}")
-        GLib.idle_add(show_detailed_error_dialog, f"Failed to copy UEFI vars file: {vars_src_name}", str(e), parent_window)
+def ensure_dir(path):
+    if path not in _ensured_dirs:
+        os.makedirs(path, exist_ok=True)
+        _ensured_dirs.add(path)
+
+def forget_dirs(root):
+    _ensured_dirs.difference_update([d for d in _ensured_dirs if d == root or d.startswith(root + "/")])
+
+def copy_uefi_files(config, parent_window=None):
+    ovmf_dir = f"{config['path']}/ovmf"
+    ensure_dir(ovmf_dir)
+    firmware = config["firmware"]
+    ovmf_files = ensure_ovmf_files(ovmf_dir, firmware == "UEFI+Secure Boot", parent_window)
+    if not ovmf_files:
         return False
+    dst_code, dst_vars = ovmf_files
 
     if firmware == "UEFI":
         config["ovmf_code"] = dst_code
         config["ovmf_vars"] = dst_vars
-        config.pop("ovmf_code_secure", None)
-        config.pop("ovmf_vars_secure", None)
+        config["ovmf_code_secure"] = ""
+        config["ovmf_vars_secure"] = ""
     elif firmware == "UEFI+Secure Boot":
         config["ovmf_code_secure"] = dst_code
         config["ovmf_vars_secure"] = dst_vars
-        config.pop("ovmf_code", None)
-        config.pop("ovmf_vars", None)
+        config["ovmf_code"] = ""
+        config["ovmf_vars"] = ""
 
     return True
 
+def create_disk_image(config, parent_window=None):
+    try:
+        os.stat(config["disk_image"])
+        return True
+    except FileNotFoundError:
+        pass
+    qemu_img = which("qemu-img")
+    if not qemu_img:
+        GLib.idle_add(show_detailed_error_dialog, "qemu-img not found.", "Please install QEMU.", parent_window)
+        logging.error("qemu-img not found for disk creation")
+        return False
+    try:
+        opts = ["-o", "lazy_refcounts=on,cluster_size=64k"] if config["disk_type"] == "qcow2" else []
+        subprocess.run([qemu_img, "create", "-f", config["disk_type"], *opts, config["disk_image"], f"{config['disk']}G"], check=True, capture_output=True, text=True)
+        logging.info(f"Created disk image {config['disk_image']}")
+        return True
+    except subprocess.CalledProcessError as e:
+        GLib.idle_add(show_detailed_error_dialog, f"Error creating disk: {e.stderr}", str(e), parent_window)
+        logging.error(f"Error creating disk {config['disk_image']}: {e.stderr}")
+        return False
+
+def prepare_vm_files(config, parent_window=None):
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        disk = pool.submit(create_disk_image, config, parent_window)
+        if config["firmware"] in ["UEFI", "UEFI+Secure Boot"] and not copy_uefi_files(config, parent_window):
+            GLib.idle_add(show_detailed_error_dialog, "Failed to copy UEFI files. Using BIOS firmware instead.", "Check OVMF installation and permissions.", parent_window)
+            logging.warning("Failed to copy UEFI files, falling back to BIOS")
+            config["firmware"] = "BIOS"
+        return disk.result()
+
 def delete_ovmf_dir(config):
-    d = os.path.join(config["path"], "ovmf")
+    d = f"{config['path']}/ovmf"
     if os.path.exists(d):
         try:
+            forget_dirs(d)
             shutil.rmtree(d)
             logging.info(f"Deleted {d}")
             return True
@@ -163,66 +293,108 @@ def validate_vm_config(vm):
         show_detailed_error_dialog("Disk image missing.", vm["disk_image"], None)
         return False
     if vm["firmware"] == "UEFI":
-        if not os.path.exists(vm.get("ovmf_code", "")) or not os.path.exists(vm.get("ovmf_vars", "")):
-            show_detailed_error_dialog("UEFI files missing.", f"Code: {vm.get('ovmf_code', '')}\nVars: {vm.get('ovmf_vars', '')}", None)
+        if not os.path.exists(vm["ovmf_code"]) or not os.path.exists(vm["ovmf_vars"]):
+            show_detailed_error_dialog("UEFI files missing.", f"Code: {vm['ovmf_code']}\nVars: {vm['ovmf_vars']}", None)
             return False
     if vm["firmware"] == "UEFI+Secure Boot":
-        if not os.path.exists(vm.get("ovmf_code_secure", "")) or not os.path.exists(vm.get("ovmf_vars_secure", "")):
-            show_detailed_error_dialog("Secure Boot files missing.", f"Code: {vm.get('ovmf_code_secure', '')}\nVars: {vm.get('ovmf_vars_secure', '')}", None)
+        if not os.path.exists(vm["ovmf_code_secure"]) or not os.path.exists(vm["ovmf_vars_secure"]):
+            show_detailed_error_dialog("Secure Boot files missing.", f"Code: {vm['ovmf_code_secure']}\nVars: {vm['ovmf_vars_secure']}", None)
             return False
-    if vm.get("iso_enabled") and vm.get("iso") and not os.path.exists(vm["iso"]):
+    if vm["iso_enabled"] and vm["iso"] and not os.path.exists(vm["iso"]):
         show_detailed_error_dialog("ISO file missing.", vm["iso"], None)
         return False
-    if vm.get("tpm_enabled"):
-        if not shutil.which("swtpm"):
+    if vm["tpm_enabled"]:
+        if not which("swtpm"):
             show_detailed_error_dialog("TPM emulator 'swtpm' not found.", "Please install swtpm package.", None)
             return False
     return True
 
+QEMU_BASE_ARGS = ("-nodefaults", "-no-user-config", "-enable-kvm", "-cpu", "host", "-boot", "order=dc,menu=off", "-device", "qemu-xhci", "-device", "usb-tablet", "-netdev", "user,id=net0,hostfwd=tcp::5555-:22", "-device", "virtio-net-pci,netdev=net0,romfile=")
+VGA_ARGS = ("-device", "virtio-vga")
+GL_VGA_ARGS = ("-device", "virtio-vga-gl", "-display", "egl-headless,gl=on")
+SPICE_ARGS = ("-spice", "port=5930,disable-ticketing=on", "-device", "virtio-serial", "-chardev", "spicevmc,id=spicechannel0,name=vdagent", "-device", "virtserialport,chardev=spicechannel0,name=com.redhat.spice.0")
+DISPLAY_ARGS = {
+    "gtk (default)": {False: ("-display", "gtk"), True: ("-display", "gtk,gl=on")},
+    "sdl": {False: ("-display", "sdl"), True: ("-display", "sdl,gl=on")},
+    "spice (virtio)": {False: SPICE_ARGS + ("-display", "spice-app"), True: SPICE_ARGS + ("-display", "spice-app,gl=on")},
+    "virtio": {False: ("-display", "egl-headless,gl=on"), True: ("-display", "egl-headless,gl=on")},
+    "qemu": {False: ("-display", "none"), True: ("-display", "none")},
+}
+DISPLAY_HINTS = {
+    "gtk (default)": ("Recommended for Linux", True),
+    "sdl": ("Recommended for Linux", True),
+    "spice (virtio)": ("Recommended for Windows", True),
+    "virtio": ("Optimized for Windows with 3D", True),
+    "qemu": ("Headless mode", False),
+}
+
+_direct_io_cache = {}
+
+def supports_direct_io(path):
+    directory = os.path.dirname(path)
+    if directory not in _direct_io_cache:
+        try:
+            os.close(os.open(path, os.O_RDONLY | os.O_DIRECT))
+            _direct_io_cache[directory] = True
+        except FileNotFoundError:
+            return False
+        except (OSError, AttributeError):
+            _direct_io_cache[directory] = False
+    return _direct_io_cache[directory]
+
+def redetect_host_tools():
+    which.cache_clear()
+    find_ovmf_source_dir.cache_clear()
+    _ovmf_cache.clear()
+    _direct_io_cache.clear()
+
+DISK_CACHE_MODES = {
+    "auto": "Automatic",
+    "none": "None (direct I/O)",
+    "writeback": "Writeback",
+    "writethrough": "Writethrough",
+}
+
+def disk_cache_opts(disk_image, mode="auto"):
+    if mode in ("auto", "none"):
+        if supports_direct_io(disk_image):
+            return "cache=none,aio=native"
+        if mode == "none":
+            logging.warning(f"{disk_image} does not support direct I/O, using writeback cache")
+        return "cache=writeback,aio=threads"
+    return f"cache={mode},aio=threads"
+
 def build_launch_command(config):
     arch = "x86_64"
-    qemu = shutil.which(f"qemu-system-{arch}")
+    qemu = which(f"qemu-system-{arch}")
     if not qemu:
         show_detailed_error_dialog("QEMU not found!", f"qemu-system-{arch} is not in your PATH.", None)
         return None
-    cmd = [qemu, "-enable-kvm", "-cpu", "host", "-smp", str(config["cpu"]), "-m", str(config["ram"]), "-drive", f"file={config['disk_image']},format={config['disk_type']},if=virtio", "-boot", "order=dc,menu=off", "-usb", "-device", "usb-tablet", "-netdev", "user,id=net0,hostfwd=tcp::5555-:22", "-device", "virtio-net-pci,netdev=net0"]
-    if config.get("3d_acceleration"):
-        cmd += ["-device", "virtio-vga-gl", "-display", "egl-headless,gl=on"]
-    else:
-        cmd += ["-device", "virtio-vga"]
-    disp = config.get("display", "").lower()
-    if disp == "gtk (default)":
-        cmd += ["-display", "gtk,gl=on" if config.get("3d_acceleration") else "gtk"]
-    elif disp == "sdl":
-        cmd += ["-display", "sdl,gl=on" if config.get("3d_acceleration") else "sdl"]
-    elif disp == "spice (virtio)":
-        cmd += ["-spice", "port=5930,disable-ticketing=on", "-device", "virtio-serial", "-chardev", "spicevmc,id=spicechannel0,name=vdagent", "-device", "virtserialport,chardev=spicechannel0,name=com.redhat.spice.0"]
-        cmd += ["-display", "spice-app,gl=on" if config.get("3d_acceleration") else "spice-app"]
-    elif disp == "virtio":
-        cmd += ["-display", "egl-headless,gl=on"]
-    elif disp == "qemu":
-        cmd += ["-display", "none"]
-    if config.get("iso_enabled") and config.get("iso"):
+    cmd = [qemu, *QEMU_BASE_ARGS, "-smp", str(config["cpu"]), "-m", str(config["ram"]), "-drive", f"file={config['disk_image']},format={config['disk_type']},if=virtio,{disk_cache_opts(config['disk_image'], config['disk_cache'])},discard=unmap,detect-zeroes=unmap"]
+    gl = bool(config["3d_acceleration"])
+    cmd += GL_VGA_ARGS if gl else VGA_ARGS
+    cmd += DISPLAY_ARGS.get(config["display"].lower(), {}).get(gl, ())
+    if config["iso_enabled"] and config["iso"]:
         cmd += ["-cdrom", config["iso"]]
-    if config["firmware"] == "UEFI" and config.get("ovmf_code") and config.get("ovmf_vars"):
+    if config["firmware"] == "UEFI" and config["ovmf_code"] and config["ovmf_vars"]:
         cmd += ["-drive", f"if=pflash,format=raw,readonly=on,file={config['ovmf_code']}", "-drive", f"if=pflash,format=raw,file={config['ovmf_vars']}"]
-    if config["firmware"] == "UEFI+Secure Boot" and config.get("ovmf_code_secure") and config.get("ovmf_vars_secure"):
+    if config["firmware"] == "UEFI+Secure Boot" and config["ovmf_code_secure"] and config["ovmf_vars_secure"]:
         cmd += ["-drive", f"if=pflash,format=raw,readonly=on,file={config['ovmf_code_secure']}", "-drive", f"if=pflash,format=raw,file={config['ovmf_vars_secure']}"]
-    if config.get("tpm_enabled"):
-        tpm_dir = os.path.join(config["path"], "tpm")
-        os.makedirs(tpm_dir, exist_ok=True)
-        sock = os.path.join(tpm_dir, "swtpm-sock")
-        try:
-            subprocess.Popen(["swtpm", "socket", "--tpm2", "--tpmstate", f"dir={tpm_dir}", "--ctrl", f"type=unixio,path={sock}", "--log", "level=0"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            cmd += ["-chardev", f"socket,id=chrtpm,path={sock}", "-tpmdev", "emulator,id=tpm0,chardev=chrtpm", "-device", "tpm-tis,tpmdev=tpm0"]
-        except FileNotFoundError:
-            show_detailed_error_dialog("swtpm not found.", "TPM cannot be enabled.", None)
-            config["tpm_enabled"] = False
-    logging.info("Built launch command: " + " ".join(cmd))
+    if config["tpm_enabled"]:
+        sock = f"{config['path']}/tpm/swtpm-sock"
+        cmd += ["-chardev", f"socket,id=chrtpm,path={sock}", "-tpmdev", "emulator,id=tpm0,chardev=chrtpm", "-device", "tpm-tis,tpmdev=tpm0"]
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug("Built launch command: %s", " ".join(cmd))
     return cmd
 
+def start_swtpm(config):
+    tpm_dir = f"{config['path']}/tpm"
+    ensure_dir(tpm_dir)
+    sock = f"{tpm_dir}/swtpm-sock"
+    subprocess.run(["swtpm", "socket", "--tpm2", "--tpmstate", f"dir={tpm_dir}", "--ctrl", f"type=unixio,path={sock}", "--log", "level=0", "--daemon"], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
 def list_snapshots(vm):
-    qi = shutil.which("qemu-img")
+    qi = which("qemu-img")
     if not qi or not os.path.exists(vm["disk_image"]):
         return []
     try:
@@ -237,7 +409,7 @@ def list_snapshots(vm):
         return []
 
 def create_snapshot_cmd(vm, snap_name):
-    qi = shutil.which("qemu-img")
+    qi = which("qemu-img")
     if not qi or not snap_name or re.search(r'[<>:"/\\|?*]', snap_name):
         return False, "Invalid snapshot name or qemu-img not found."
     try:
@@ -248,7 +420,7 @@ def create_snapshot_cmd(vm, snap_name):
         return False, e.stderr
 
 def restore_snapshot_cmd(vm, snap_name):
-    qi = shutil.which("qemu-img")
+    qi = which("qemu-img")
     if not qi:
         return False, "qemu-img not found."
     try:
@@ -259,7 +431,7 @@ def restore_snapshot_cmd(vm, snap_name):
         return False, e.stderr
 
 def delete_snapshot_cmd(vm, snap_name):
-    qi = shutil.which("qemu-img")
+    qi = which("qemu-img")
     if not qi:
         return False, "qemu-img not found."
     try:
@@ -269,45 +441,178 @@ def delete_snapshot_cmd(vm, snap_name):
         logging.error(f"Failed to delete snapshot '{snap_name}': {e.stderr}")
         return False, e.stderr
 
-def load_vm_index():
-    if os.path.exists(CONFIG_FILE) and os.path.getsize(CONFIG_FILE) > 0:
+def qmp_socket_path(vm):
+    digest = hashlib.sha1(f"{vm['path']}/{vm['name']}".encode()).hexdigest()[:12]
+    return f"{RUNTIME_DIR}/nqg-{digest}.qmp"
+
+class QMPClient:
+    def __init__(self, sock_path, timeout=60):
+        self.sock_path = sock_path
+        self.timeout = timeout
+        self.sock = None
+        self.file = None
+        self.lock = threading.Lock()
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
         try:
-            with open(CONFIG_FILE) as f:
-                return json.load(f)
-        except json.JSONDecodeError:
-            return []
-    return []
+            sock.connect(self.sock_path)
+        except OSError:
+            sock.close()
+            raise
+        self.sock, self.file = sock, sock.makefile("rwb")
+        self.file.readline()
+        self.send("qmp_capabilities")
+
+    def send(self, command, arguments=None):
+        msg = {"execute": command}
+        if arguments:
+            msg["arguments"] = arguments
+        self.file.write(json_dumps(msg) + b"\n")
+        self.file.flush()
+        while True:
+            line = self.file.readline()
+            if not line:
+                raise ConnectionError("QMP connection closed")
+            reply = json_loads(line)
+            if "error" in reply:
+                raise RuntimeError(reply["error"].get("desc", "QMP command failed"))
+            if "return" in reply:
+                return reply["return"]
+
+    def execute(self, command, arguments=None):
+        # One connection per VM is kept open and re-established after failures.
+        with self.lock:
+            try:
+                if self.sock is None:
+                    self.connect()
+                return self.send(command, arguments)
+            except OSError:
+                self.close()
+                raise
+
+    def hmp(self, command_line):
+        out = self.execute("human-monitor-command", {"command-line": command_line})
+        if out.strip():
+            raise RuntimeError(out.strip())
+
+    def close(self):
+        if self.sock is not None:
+            self.file.close()
+            self.sock.close()
+            self.sock = self.file = None
+
+POWER_ACTIONS = {
+    "Shut Down": "system_powerdown",
+    "Restart": "system_reset",
+    "Pause": "stop",
+    "Continue": "cont",
+    "Force Off": "quit",
+}
+
+def fast_resume_supported(vm):
+    return vm["fast_resume"] and vm["disk_type"] == "qcow2" and vm["firmware"] == "BIOS"
+
+def json_loads(data):
+    return orjson.loads(data) if orjson else json.loads(data)
+
+def json_dumps(obj):
+    return orjson.dumps(obj, option=orjson.OPT_INDENT_2) if orjson else json.dumps(obj, indent=4).encode()
+
+def write_json_file(path, obj):
+    data = memoryview(json_dumps(obj))
+    tmp = path + ".tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        while data:
+            data = data[os.write(fd, data):]
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    os.replace(tmp, path)
+
+def load_vm_index():
+    try:
+        with open(CONFIG_FILE, "rb") as f:
+            data = f.read()
+        return json_loads(data) if data else []
+    except (FileNotFoundError, json.JSONDecodeError):
+        return []
 
 def save_vm_index(index):
-    with open(CONFIG_FILE, "w") as f:
-        json.dump(index, f, indent=4)
+    write_json_file(CONFIG_FILE, index)
+
+_config_cache = {}
+_config_cache_lock = threading.Lock()
+
+VM_DEFAULTS = {
+    "cpu": 2, "ram": 4096, "disk_type": "qcow2", "firmware": "BIOS",
+    "display": "gtk (default)", "iso": "", "iso_enabled": False,
+    "3d_acceleration": False, "tpm_enabled": False, "fast_resume": False,
+    "disk_cache": "auto",
+    "ovmf_code": "", "ovmf_vars": "", "ovmf_code_secure": "", "ovmf_vars_secure": "",
+}
+
+def load_vm_dir_configs(p):
+    configs = []
+    try:
+        with os.scandir(p) as it:
+            entries = [e for e in it if e.name.endswith(".json") and e.is_file()]
+    except OSError:
+        entries = []
+    present = {e.path for e in entries}
+    base = os.path.normpath(p)
+    with _config_cache_lock:
+        for path in [path for path in _config_cache if os.path.dirname(path) == base and path not in present]:
+            del _config_cache[path]
+    for entry in entries:
+        try:
+            mtime = entry.stat().st_mtime_ns
+            cached = _config_cache.get(entry.path)
+            if cached and cached[0] == mtime:
+                configs.append(cached[1])
+                continue
+            with open(entry.path, "rb") as f:
+                config = {**VM_DEFAULTS, **json_loads(f.read())}
+            # Commands saved by older versions are stale; start_vm builds its own.
+            config.pop("launch_cmd", None)
+            with _config_cache_lock:
+                _config_cache[entry.path] = (mtime, config)
+            configs.append(config)
+        except (OSError, json.JSONDecodeError, KeyError, TypeError):
+            logging.warning(f"Could not load or parse config in {p}")
+    return configs
 
 def load_all_vm_configs():
     configs = []
     index = load_vm_index()
     valid_paths = []
-    for p in index:
-        if not os.path.isdir(p):
-            continue
-        config_found = False
-        for fn in os.listdir(p):
-            if fn.endswith(".json") and os.path.isfile(os.path.join(p, fn)):
-                try:
-                    with open(os.path.join(p, fn)) as f:
-                        configs.append(json.load(f))
-                    config_found = True
-                except (json.JSONDecodeError, KeyError):
-                    logging.warning(f"Could not load or parse config in {p}")
-        if config_found:
+    with ThreadPoolExecutor(max_workers=min(8, len(index) or 1)) as pool:
+        results = list(pool.map(load_vm_dir_configs, index))
+    for p, dir_configs in zip(index, results):
+        if dir_configs:
+            configs += dir_configs
             valid_paths.append(p)
     if len(valid_paths) != len(index):
         save_vm_index(valid_paths)
-    return configs
+    return configs, valid_paths
+
+def unique_name(base, taken):
+    if base not in taken:
+        return base
+    pattern = re.compile(re.escape(base) + r"_(\d+)")
+    suffixes = (int(m.group(1)) for m in map(pattern.fullmatch, taken) if m)
+    return f"{base}_{max(suffixes, default=1) + 1}"
+
+def vm_key(vm):
+    return vm["path"], vm["name"]
 
 def save_vm_config(config):
-    fn = os.path.join(config["path"], config["name"] + ".json")
-    with open(fn, "w") as f:
-        json.dump(config, f, indent=4)
+    fn = f"{config['path']}/{config['name']}.json"
+    write_json_file(fn, config)
+    with _config_cache_lock:
+        _config_cache[fn] = (os.stat(fn).st_mtime_ns, config)
 
 def show_info_dialog(message, details, parent):
     dlg = Gtk.MessageDialog(transient_for=parent, flags=0, message_type=Gtk.MessageType.INFO, buttons=Gtk.ButtonsType.OK, text=message)
@@ -341,6 +646,21 @@ def show_detailed_error_dialog(message, details, parent):
     dlg.run()
     dlg.destroy()
 
+def choose_iso_file(parent):
+    d = Gtk.FileChooserDialog(title="Select ISO File", parent=parent, action=Gtk.FileChooserAction.OPEN)
+    d.add_buttons(Gtk.STOCK_CANCEL, Gtk.ResponseType.CANCEL, Gtk.STOCK_OPEN, Gtk.ResponseType.OK)
+    d.add_filter(iso_filter())
+    filename = d.get_filename() if d.run() == Gtk.ResponseType.OK else None
+    d.destroy()
+    return filename
+
+def choose_folder_into(parent, entry):
+    d = Gtk.FileChooserDialog(title="Select Folder", parent=parent, action=Gtk.FileChooserAction.SELECT_FOLDER)
+    d.add_buttons(Gtk.STOCK_CANCEL, Gtk.ResponseType.CANCEL, "Select", Gtk.ResponseType.OK)
+    if d.run() == Gtk.ResponseType.OK:
+        entry.set_text(d.get_filename())
+    d.destroy()
+
 class ProgressDialog(Gtk.Dialog):
     def __init__(self, parent, title="Processing..."):
         super().__init__(title=title, transient_for=parent)
@@ -359,6 +679,7 @@ class ProgressDialog(Gtk.Dialog):
         self.progress.set_text("0%")
         self.progress.set_show_text(True)
         box.add(self.progress)
+        self.connect("delete-event", lambda w, e: True)
         self.show_all()
 
     def update(self, fraction, text):
@@ -376,6 +697,18 @@ class ProgressDialog(Gtk.Dialog):
     def set_text(self, text):
         self.label.set_text(text)
 
+    def start_pulse(self, text):
+        self.pulse_text = text
+        self.last_pulse = 0
+        self.progress.add_tick_callback(self.on_pulse_tick)
+
+    def on_pulse_tick(self, widget, frame_clock):
+        now = frame_clock.get_frame_time()
+        if now - self.last_pulse >= 100000:
+            self.last_pulse = now
+            self.pulse(self.pulse_text)
+        return GLib.SOURCE_CONTINUE
+
 class ISOSelectDialog(Gtk.Window):
     def __init__(self, parent):
         super().__init__(title="Select ISO for Virtual Machine", transient_for=parent)
@@ -398,8 +731,7 @@ class ISOSelectDialog(Gtk.Window):
         drop.get_style_context().add_class("iso-drop-area")
         drop.connect("drag-data-received", self.on_drag_received)
         drop.drag_dest_set(Gtk.DestDefaults.ALL, [], Gdk.DragAction.COPY)
-        target = Gtk.TargetEntry.new("text/uri-list", 0, 0)
-        drop.drag_dest_set_target_list(Gtk.TargetList.new([target]))
+        drop.drag_dest_add_uri_targets()
         vbox.pack_start(drop, True, True, 0)
         vbox.pack_start(Gtk.Label(label="Drag ISO here or click '+'"), False, False, 0)
         skip_btn = Gtk.Button(label="Skip")
@@ -409,43 +741,92 @@ class ISOSelectDialog(Gtk.Window):
         self.add(vbox)
 
     def on_plus_clicked(self, w):
-        d = Gtk.FileChooserDialog(title="Select ISO File", parent=self,
-                                  action=Gtk.FileChooserAction.OPEN)
-        d.add_buttons(Gtk.STOCK_CANCEL, Gtk.ResponseType.CANCEL, Gtk.STOCK_OPEN, Gtk.ResponseType.OK)
-        f = Gtk.FileFilter()
-        f.set_name("ISO Files")
-        f.add_pattern("*.iso")
-        d.add_filter(f)
-        if d.run() == Gtk.ResponseType.OK:
-            self.iso_chosen(d.get_filename())
-        d.destroy()
+        iso_path = choose_iso_file(self)
+        if iso_path:
+            self.iso_chosen(iso_path)
 
     def on_drag_received(self, w, dc, x, y, data, info, time):
         uris = data.get_uris()
         if uris:
-            self.iso_chosen(urllib.parse.unquote(uris[0].replace("file://", "").strip()))
+            uri = uris[0].strip()
+            try:
+                uri, _ = GLib.filename_from_uri(uri)
+            except GLib.Error:
+                parsed = urllib.parse.urlparse(uri)
+                uri = urllib.parse.unquote(parsed.path if parsed.scheme == "file" else uri)
+            self.iso_chosen(uri)
 
     def on_skip_clicked(self, w):
-        self.destroy()
-        d = VMCreateDialog(self.parent)
-        if d.run() == Gtk.ResponseType.OK:
-            config = d.get_vm_config()
-            if config:
-                self.parent.add_vm(config)
-        d.destroy()
+        self.iso_chosen(None)
 
     def iso_chosen(self, iso_path):
         self.destroy()
         d = VMCreateDialog(self.parent, iso_path)
-        if d.run() == Gtk.ResponseType.OK:
-            config = d.get_vm_config()
-            if config:
-                self.parent.add_vm(config)
-        d.destroy()
+        d.connect("response", self.parent.on_create_response)
+
+class VMFormMixin:
+    def attach_cpu_ram(self, grid, row, width, config):
+        grid.attach(Gtk.Label(label="CPU Cores:"), 0, row, 1, 1)
+        self.spin_cpu = Gtk.SpinButton.new_with_range(1, os.cpu_count(), 1)
+        self.spin_cpu.set_value(config["cpu"])
+        self.spin_cpu.set_tooltip_text("Number of CPU cores for the VM")
+        grid.attach(self.spin_cpu, 1, row, width, 1)
+        grid.attach(Gtk.Label(label=f"Max: {os.cpu_count()}"), width + 1, row, 1, 1)
+        grid.attach(Gtk.Label(label="RAM (MiB):"), 0, row + 1, 1, 1)
+        self.spin_ram = Gtk.SpinButton.new_with_range(256, 131072, 256)
+        self.spin_ram.set_value(config["ram"])
+        self.spin_ram.set_tooltip_text("Memory allocation in MiB")
+        grid.attach(self.spin_ram, 1, row + 1, width, 1)
+        grid.attach(Gtk.Label(label="Max: 131072 MiB"), width + 1, row + 1, 1, 1)
 
-class VMCreateDialog(Gtk.Dialog):
+    def attach_firmware_display(self, grid, row, width, config):
+        grid.attach(Gtk.Label(label="Firmware:"), 0, row, 1, 1)
+        fw_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=5)
+        self.radio_bios = Gtk.RadioButton.new_with_label_from_widget(None, "BIOS")
+        self.radio_bios.set_tooltip_text("Traditional BIOS boot")
+        self.radio_uefi = Gtk.RadioButton.new_with_label_from_widget(self.radio_bios, "UEFI")
+        self.radio_uefi.set_tooltip_text("Modern UEFI boot")
+        self.radio_secure = Gtk.RadioButton.new_with_label_from_widget(self.radio_bios, "UEFI+Secure Boot")
+        self.radio_secure.set_tooltip_text("UEFI with Secure Boot enabled")
+        fw_box.pack_start(self.radio_bios, False, False, 0)
+        fw_box.pack_start(self.radio_uefi, False, False, 0)
+        fw_box.pack_start(self.radio_secure, False, False, 0)
+        if config["firmware"] == "UEFI": self.radio_uefi.set_active(True)
+        elif config["firmware"] == "UEFI+Secure Boot": self.radio_secure.set_active(True)
+        else: self.radio_bios.set_active(True)
+        grid.attach(fw_box, 1, row, width, 1)
+        grid.attach(Gtk.Label(label="Enable TPM:"), 0, row + 1, 1, 1)
+        self.check_tpm = Gtk.CheckButton()
+        self.check_tpm.set_active(config["tpm_enabled"])
+        self.check_tpm.set_tooltip_text("Enable Trusted Platform Module")
+        grid.attach(self.check_tpm, 1, row + 1, width, 1)
+        grid.attach(Gtk.Label(label="Display:"), 0, row + 2, 1, 1)
+        self.combo_disp = Gtk.ComboBoxText()
+        disp_opts = list(DISPLAY_ARGS)
+        for opt in disp_opts: self.combo_disp.append_text(opt)
+        self.combo_disp.set_active(disp_opts.index(config["display"]) if config["display"] in disp_opts else 0)
+        self.combo_disp.set_tooltip_text("Select display backend")
+        grid.attach(self.combo_disp, 1, row + 2, width, 1)
+        self.recommend_label = Gtk.Label()
+        grid.attach(self.recommend_label, width + 1, row + 2, 1, 1)
+        self.combo_disp.connect("changed", self.on_display_changed)
+        grid.attach(Gtk.Label(label="3D Acceleration:"), 0, row + 3, 1, 1)
+        self.check_3d = Gtk.CheckButton()
+        self.check_3d.set_active(config["3d_acceleration"])
+        self.check_3d.set_tooltip_text("Enable 3D graphics acceleration")
+        grid.attach(self.check_3d, 1, row + 3, width, 1)
+
+    def on_display_changed(self, combo):
+        hint, allows_3d = DISPLAY_HINTS[combo.get_active_text()]
+        self.recommend_label.set_text(hint)
+        self.check_3d.set_sensitive(allows_3d)
+        if not allows_3d:
+            self.check_3d.set_active(False)
+
+class VMCreateDialog(VMFormMixin, Gtk.Dialog):
     def __init__(self, parent, iso_path=None):
         super().__init__(title="New Virtual Machine Configuration", transient_for=parent)
+        self.set_modal(True)
         self.set_default_size(500, 500)
         self.set_resizable(True)
         self.iso_path = iso_path
@@ -468,18 +849,7 @@ class VMCreateDialog(Gtk.Dialog):
         btn.connect("clicked", self.on_browse)
         grid.attach(self.entry_path, 1, 1, 1, 1)
         grid.attach(btn, 2, 1, 1, 1)
-        grid.attach(Gtk.Label(label="CPU Cores:"), 0, 2, 1, 1)
-        self.spin_cpu = Gtk.SpinButton.new_with_range(1, os.cpu_count(), 1)
-        self.spin_cpu.set_value(2)
-        self.spin_cpu.set_tooltip_text("Number of CPU cores for the VM")
-        grid.attach(self.spin_cpu, 1, 2, 2, 1)
-        grid.attach(Gtk.Label(label=f"Max: {os.cpu_count()}"), 3, 2, 1, 1)
-        grid.attach(Gtk.Label(label="RAM (MiB):"), 0, 3, 1, 1)
-        self.spin_ram = Gtk.SpinButton.new_with_range(256, 131072, 256)
-        self.spin_ram.set_value(4096)
-        self.spin_ram.set_tooltip_text("Memory allocation in MiB")
-        grid.attach(self.spin_ram, 1, 3, 2, 1)
-        grid.attach(Gtk.Label(label="Max: 131072 MiB"), 3, 3, 1, 1)
+        self.attach_cpu_ram(grid, 2, 2, VM_DEFAULTS)
         grid.attach(Gtk.Label(label="Disk Size (GB):"), 0, 4, 1, 1)
         self.spin_disk = Gtk.SpinButton.new_with_range(1, 128, 1)
         self.spin_disk.set_value(40)
@@ -492,65 +862,15 @@ class VMCreateDialog(Gtk.Dialog):
         self.radio_raw.set_tooltip_text("Full disk allocation, higher performance")
         grid.attach(self.radio_qcow2, 1, 5, 1, 1)
         grid.attach(self.radio_raw, 2, 5, 1, 1)
-        grid.attach(Gtk.Label(label="Firmware:"), 0, 6, 1, 1)
-        fw_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=5)
-        self.radio_bios = Gtk.RadioButton.new_with_label_from_widget(None, "BIOS")
-        self.radio_bios.set_tooltip_text("Traditional BIOS boot")
-        self.radio_uefi = Gtk.RadioButton.new_with_label_from_widget(self.radio_bios, "UEFI")
-        self.radio_uefi.set_tooltip_text("Modern UEFI boot")
-        self.radio_secure = Gtk.RadioButton.new_with_label_from_widget(self.radio_bios, "UEFI+Secure Boot")
-        self.radio_secure.set_tooltip_text("UEFI with Secure Boot enabled")
-        fw_box.pack_start(self.radio_bios, False, False, 0)
-        fw_box.pack_start(self.radio_uefi, False, False, 0)
-        fw_box.pack_start(self.radio_secure, False, False, 0)
-        grid.attach(fw_box, 1, 6, 2, 1)
-        grid.attach(Gtk.Label(label="Enable TPM:"), 0, 7, 1, 1)
-        self.check_tpm = Gtk.CheckButton()
-        self.check_tpm.set_tooltip_text("Enable Trusted Platform Module")
-        grid.attach(self.check_tpm, 1, 7, 2, 1)
-        grid.attach(Gtk.Label(label="Display:"), 0, 8, 1, 1)
-        self.combo_disp = Gtk.ComboBoxText()
-        for opt in ["gtk (default)", "sdl", "spice (virtio)", "virtio", "qemu"]:
-            self.combo_disp.append_text(opt)
-        self.combo_disp.set_active(0)
-        self.combo_disp.set_tooltip_text("Select display backend")
-        grid.attach(self.combo_disp, 1, 8, 2, 1)
-        self.recommend_label = Gtk.Label()
-        grid.attach(self.recommend_label, 3, 8, 1, 1)
-        self.combo_disp.connect("changed", self.on_display_changed)
-        grid.attach(Gtk.Label(label="3D Acceleration:"), 0, 9, 1, 1)
-        self.check_3d = Gtk.CheckButton()
-        self.check_3d.set_tooltip_text("Enable 3D graphics acceleration")
-        grid.attach(self.check_3d, 1, 9, 2, 1)
+        self.attach_firmware_display(grid, 6, 2, VM_DEFAULTS)
         box.add(grid)
         self.add_button("Cancel", Gtk.ResponseType.CANCEL)
         self.add_button("Create", Gtk.ResponseType.OK)
         self.show_all()
         self.on_display_changed(self.combo_disp)
 
-    def on_display_changed(self, combo):
-        selected = combo.get_active_text().lower()
-        if "gtk" in selected or "sdl" in selected:
-            self.recommend_label.set_text("Recommended for Linux")
-            self.check_3d.set_sensitive(True)
-        elif "spice" in selected:
-            self.recommend_label.set_text("Recommended for Windows")
-            self.check_3d.set_sensitive(True)
-        elif "virtio" in selected:
-            self.recommend_label.set_text("Optimized for Windows with 3D")
-            self.check_3d.set_sensitive(True)
-        elif "qemu" in selected:
-            self.recommend_label.set_text("Headless mode")
-            self.check_3d.set_sensitive(False)
-            self.check_3d.set_active(False)
-
     def on_browse(self, w):
-        d = Gtk.FileChooserDialog(title="Select Folder", parent=self,
-                                  action=Gtk.FileChooserAction.SELECT_FOLDER)
-        d.add_buttons(Gtk.STOCK_CANCEL, Gtk.ResponseType.CANCEL, "Select", Gtk.ResponseType.OK)
-        if d.run() == Gtk.ResponseType.OK:
-            self.entry_path.set_text(d.get_filename())
-        d.destroy()
+        choose_folder_into(self, self.entry_path)
 
     def get_vm_config(self):
         name = self.entry_name.get_text()
@@ -577,41 +897,22 @@ class VMCreateDialog(Gtk.Dialog):
         if self.radio_uefi.get_active(): firmware = "UEFI"
         elif self.radio_secure.get_active(): firmware = "UEFI+Secure Boot"
         config = {
+            **VM_DEFAULTS,
             "name": name, "path": path, "cpu": self.spin_cpu.get_value_as_int(),
             "ram": ram, "disk": self.spin_disk.get_value_as_int(),
             "disk_type": "qcow2" if self.radio_qcow2.get_active() else "raw",
             "firmware": firmware, "display": self.combo_disp.get_active_text(),
             "iso": self.iso_path or "", "iso_enabled": bool(self.iso_path),
             "3d_acceleration": self.check_3d.get_active(),
-            "disk_image": os.path.join(path, name + ".img"),
+            "disk_image": f"{path}/{name}.img",
             "tpm_enabled": self.check_tpm.get_active(),
         }
-        if not os.path.exists(config["disk_image"]):
-            qemu_img = shutil.which("qemu-img")
-            if qemu_img:
-                try:
-                    subprocess.run([qemu_img, "create", "-f", config["disk_type"],
-                                   config["disk_image"], f"{config['disk']}G"], check=True, capture_output=True, text=True)
-                    logging.info(f"Created disk image {config['disk_image']}")
-                except subprocess.CalledProcessError as e:
-                    show_detailed_error_dialog(f"Error creating disk: {e.stderr}", str(e), self)
-                    logging.error(f"Error creating disk {config['disk_image']}: {e.stderr}")
-                    return None
-            else:
-                show_detailed_error_dialog("qemu-img not found.", "Please install QEMU.", self)
-                logging.error("qemu-img not found for disk creation")
-                return None
-        if config["firmware"] in ["UEFI", "UEFI+Secure Boot"]:
-            if not copy_uefi_files(config, self):
-                show_detailed_error_dialog("Failed to copy UEFI files. Using BIOS firmware instead.", "Check OVMF installation and permissions.", self)
-                logging.warning("Failed to copy UEFI files, falling back to BIOS")
-                config["firmware"] = "BIOS"
-        config["launch_cmd"] = build_launch_command(config)
         return config
 
-class VMSettingsDialog(Gtk.Dialog):
+class VMSettingsDialog(VMFormMixin, Gtk.Dialog):
     def __init__(self, parent, config):
         super().__init__(title="Edit Virtual Machine Settings", transient_for=parent)
+        self.set_modal(True)
         self.set_default_size(500, 450)
         self.set_resizable(True)
         self.config = config.copy()
@@ -625,12 +926,12 @@ class VMSettingsDialog(Gtk.Dialog):
         grid.set_margin_end(10)
         grid.attach(Gtk.Label(label="Virtual Machine Name:"), 0, 0, 1, 1)
         self.entry_name = Gtk.Entry()
-        self.entry_name.set_text(self.config.get("name", ""))
+        self.entry_name.set_text(self.config["name"])
         self.entry_name.set_tooltip_text("Edit the VM name")
         grid.attach(self.entry_name, 1, 0, 3, 1)
         grid.attach(Gtk.Label(label="ISO Path:"), 0, 1, 1, 1)
         self.entry_iso = Gtk.Entry()
-        self.entry_iso.set_text(self.config.get("iso", ""))
+        self.entry_iso.set_text(self.config["iso"])
         self.entry_iso.set_tooltip_text("Path to the ISO file")
         grid.attach(self.entry_iso, 1, 1, 2, 1)
         self.btn_iso_browse = Gtk.Button(label="Browse")
@@ -638,81 +939,37 @@ class VMSettingsDialog(Gtk.Dialog):
         self.btn_iso_browse.connect("clicked", self.on_iso_browse)
         grid.attach(self.btn_iso_browse, 3, 1, 1, 1)
         self.check_iso_enable = Gtk.CheckButton()
-        self.check_iso_enable.set_active(self.config.get("iso_enabled", False))
+        self.check_iso_enable.set_active(self.config["iso_enabled"])
         self.check_iso_enable.set_tooltip_text("Enable or disable ISO usage")
         self.check_iso_enable.connect("toggled", self.on_iso_enabled_toggled_settings)
         grid.attach(self.check_iso_enable, 4, 1, 1, 1)
-        grid.attach(Gtk.Label(label="CPU Cores:"), 0, 2, 1, 1)
-        self.spin_cpu = Gtk.SpinButton.new_with_range(1, os.cpu_count(), 1)
-        self.spin_cpu.set_value(self.config.get("cpu", 2))
-        self.spin_cpu.set_tooltip_text("Number of CPU cores for the VM")
-        grid.attach(self.spin_cpu, 1, 2, 3, 1)
-        grid.attach(Gtk.Label(label=f"Max: {os.cpu_count()}"), 4, 2, 1, 1)
-        grid.attach(Gtk.Label(label="RAM (MiB):"), 0, 3, 1, 1)
-        self.spin_ram = Gtk.SpinButton.new_with_range(256, 131072, 256)
-        self.spin_ram.set_value(self.config.get("ram", 4096))
-        self.spin_ram.set_tooltip_text("Memory allocation in MiB")
-        grid.attach(self.spin_ram, 1, 3, 3, 1)
-        grid.attach(Gtk.Label(label="Max: 131072 MiB"), 4, 3, 1, 1)
-        grid.attach(Gtk.Label(label="Firmware:"), 0, 4, 1, 1)
-        fw_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=5)
-        self.radio_bios = Gtk.RadioButton.new_with_label_from_widget(None, "BIOS")
-        self.radio_bios.set_tooltip_text("Traditional BIOS boot")
-        self.radio_uefi = Gtk.RadioButton.new_with_label_from_widget(self.radio_bios, "UEFI")
-        self.radio_uefi.set_tooltip_text("Modern UEFI boot")
-        self.radio_secure = Gtk.RadioButton.new_with_label_from_widget(self.radio_bios, "UEFI+Secure Boot")
-        self.radio_secure.set_tooltip_text("UEFI with Secure Boot enabled")
-        fw_box.pack_start(self.radio_bios, False, False, 0)
-        fw_box.pack_start(self.radio_uefi, False, False, 0)
-        fw_box.pack_start(self.radio_secure, False, False, 0)
-        if self.config.get("firmware", "BIOS") == "UEFI": self.radio_uefi.set_active(True)
-        elif self.config.get("firmware") == "UEFI+Secure Boot": self.radio_secure.set_active(True)
-        else: self.radio_bios.set_active(True)
-        grid.attach(fw_box, 1, 4, 3, 1)
-        grid.attach(Gtk.Label(label="Enable TPM:"), 0, 5, 1, 1)
-        self.check_tpm = Gtk.CheckButton()
-        self.check_tpm.set_active(self.config.get("tpm_enabled", False))
-        self.check_tpm.set_tooltip_text("Enable Trusted Platform Module")
-        grid.attach(self.check_tpm, 1, 5, 3, 1)
-        grid.attach(Gtk.Label(label="Display:"), 0, 6, 1, 1)
-        self.combo_disp = Gtk.ComboBoxText()
-        disp_opts = ["gtk (default)", "sdl", "spice (virtio)", "virtio", "qemu"]
-        for opt in disp_opts: self.combo_disp.append_text(opt)
-        active_index = disp_opts.index(self.config.get("display", disp_opts[0])) if self.config.get("display") in disp_opts else 0
-        self.combo_disp.set_active(active_index)
-        self.combo_disp.set_tooltip_text("Select display backend")
-        grid.attach(self.combo_disp, 1, 6, 3, 1)
-        self.recommend_label = Gtk.Label()
-        grid.attach(self.recommend_label, 4, 6, 1, 1)
-        self.combo_disp.connect("changed", self.on_display_changed)
-        grid.attach(Gtk.Label(label="3D Acceleration:"), 0, 7, 1, 1)
-        self.check_3d = Gtk.CheckButton()
-        self.check_3d.set_active(self.config.get("3d_acceleration", False))
-        self.check_3d.set_tooltip_text("Enable 3D graphics acceleration")
-        grid.attach(self.check_3d, 1, 7, 3, 1)
+        self.attach_cpu_ram(grid, 2, 3, self.config)
+        self.attach_firmware_display(grid, 4, 3, self.config)
+        grid.attach(Gtk.Label(label="Fast Resume:"), 0, 8, 1, 1)
+        self.check_resume = Gtk.CheckButton()
+        self.check_resume.set_active(self.config["fast_resume"])
+        self.radio_bios.connect("toggled", self.update_resume_sensitivity)
+        self.update_resume_sensitivity(self.radio_bios)
+        self.check_resume.set_tooltip_text("Save the running state on suspend and restore it on the next start (qcow2 disk with BIOS firmware)")
+        grid.attach(self.check_resume, 1, 8, 3, 1)
+        grid.attach(Gtk.Label(label="Disk Cache:"), 0, 9, 1, 1)
+        self.combo_cache = Gtk.ComboBoxText()
+        for mode, label in DISK_CACHE_MODES.items():
+            self.combo_cache.append(mode, label)
+        if not self.combo_cache.set_active_id(self.config["disk_cache"]):
+            self.combo_cache.set_active_id("auto")
+        self.combo_cache.set_tooltip_text("Host caching of the disk image; Automatic bypasses the page cache where the filesystem allows it")
+        grid.attach(self.combo_cache, 1, 9, 3, 1)
         box.add(grid)
         self.add_button("Cancel", Gtk.ResponseType.CANCEL)
         self.add_button("Apply", Gtk.ResponseType.OK)
         self.show_all()
         self.on_display_changed(self.combo_disp)
-        self.initial_firmware = self.config.get("firmware", "BIOS")
+        self.initial_firmware = self.config["firmware"]
         self.update_iso_entry_sensitivity_settings()
 
-    def on_display_changed(self, combo):
-        selected = combo.get_active_text().lower()
-        if "gtk" in selected or "sdl" in selected:
-            self.recommend_label.set_text("Recommended for Linux")
-            self.check_3d.set_sensitive(True)
-        elif "spice" in selected:
-            self.recommend_label.set_text("Recommended for Windows")
-            self.check_3d.set_sensitive(True)
-        elif "virtio" in selected:
-            self.recommend_label.set_text("Optimized for Windows with 3D")
-            self.check_3d.set_sensitive(True)
-        elif "qemu" in selected:
-            self.recommend_label.set_text("Headless mode")
-            self.check_3d.set_sensitive(False)
-            self.check_3d.set_active(False)
+    def update_resume_sensitivity(self, radio):
+        self.check_resume.set_sensitive(self.config["disk_type"] == "qcow2" and radio.get_active())
 
     def on_iso_enabled_toggled_settings(self, check):
         self.update_iso_entry_sensitivity_settings()
@@ -723,15 +980,9 @@ class VMSettingsDialog(Gtk.Dialog):
         self.btn_iso_browse.set_sensitive(is_enabled)
 
     def on_iso_browse(self, w):
-        d = Gtk.FileChooserDialog(title="Select ISO File", parent=self, action=Gtk.FileChooserAction.OPEN)
-        d.add_buttons(Gtk.STOCK_CANCEL, Gtk.ResponseType.CANCEL, Gtk.STOCK_OPEN, Gtk.ResponseType.OK)
-        f = Gtk.FileFilter()
-        f.set_name("ISO Files")
-        f.add_pattern("*.iso")
-        d.add_filter(f)
-        if d.run() == Gtk.ResponseType.OK:
-            self.entry_iso.set_text(d.get_filename())
-        d.destroy()
+        iso_path = choose_iso_file(self)
+        if iso_path:
+            self.entry_iso.set_text(iso_path)
 
     def get_updated_config(self):
         new_config = self.config.copy()
@@ -746,10 +997,10 @@ class VMSettingsDialog(Gtk.Dialog):
             return None
 
         if new_name != self.original_name:
-            old_conf_file = os.path.join(self.original_path, f"{self.original_name}.json")
-            new_conf_file = os.path.join(self.original_path, f"{new_name}.json")
+            old_conf_file = f"{self.original_path}/{self.original_name}.json"
+            new_conf_file = f"{self.original_path}/{new_name}.json"
             old_disk_image = new_config["disk_image"]
-            new_disk_image = os.path.join(self.original_path, f"{new_name}.img")
+            new_disk_image = f"{self.original_path}/{new_name}.img"
             try:
                 if os.path.exists(old_conf_file):
                     os.rename(old_conf_file, new_conf_file)
@@ -774,6 +1025,8 @@ class VMSettingsDialog(Gtk.Dialog):
         new_config["display"] = self.combo_disp.get_active_text()
         new_config["3d_acceleration"] = self.check_3d.get_active()
         new_config["tpm_enabled"] = self.check_tpm.get_active()
+        new_config["fast_resume"] = self.check_resume.get_active() and self.check_resume.get_sensitive()
+        new_config["disk_cache"] = self.combo_cache.get_active_id()
         if "arch" in new_config:
             del new_config["arch"]
 
@@ -784,17 +1037,15 @@ class VMSettingsDialog(Gtk.Dialog):
                     new_config["firmware"] = self.initial_firmware
             else:
                 delete_ovmf_dir(new_config)
-                new_config.pop("ovmf_code", None)
-                new_config.pop("ovmf_code_secure", None)
-                new_config.pop("ovmf_vars", None)
-                new_config.pop("ovmf_vars_secure", None)
+                for key in ("ovmf_code", "ovmf_code_secure", "ovmf_vars", "ovmf_vars_secure"):
+                    new_config[key] = VM_DEFAULTS[key]
 
-        new_config["launch_cmd"] = build_launch_command(new_config)
         return new_config
 
 class VMCloneDialog(Gtk.Dialog):
-    def __init__(self, parent, vm_config):
+    def __init__(self, parent, vm_config, taken_names=()):
         super().__init__(title="Clone Virtual Machine", transient_for=parent)
+        self.set_modal(True)
         self.set_default_size(400, 200)
         self.set_resizable(True)
         self.original_vm = vm_config
@@ -805,7 +1056,7 @@ class VMCloneDialog(Gtk.Dialog):
         grid.set_margin_start(10)
         grid.set_margin_end(10)
         grid.attach(Gtk.Label(label="New Virtual Machine Name:"), 0, 0, 1, 1)
-        self.entry_new_name = Gtk.Entry(text=self.original_vm["name"] + "_clone")
+        self.entry_new_name = Gtk.Entry(text=unique_name(self.original_vm["name"] + "_clone", taken_names))
         self.entry_new_name.set_tooltip_text("Enter a name for the cloned VM")
         grid.attach(self.entry_new_name, 1, 0, 2, 1)
         grid.attach(Gtk.Label(label="New Folder:"), 0, 1, 1, 1)
@@ -822,12 +1073,7 @@ class VMCloneDialog(Gtk.Dialog):
         self.show_all()
 
     def on_browse(self, w):
-        d = Gtk.FileChooserDialog(title="Select Folder", parent=self,
-                                  action=Gtk.FileChooserAction.SELECT_FOLDER)
-        d.add_buttons(Gtk.STOCK_CANCEL, Gtk.ResponseType.CANCEL, "Select", Gtk.ResponseType.OK)
-        if d.run() == Gtk.ResponseType.OK:
-            self.entry_new_path.set_text(d.get_filename())
-        d.destroy()
+        choose_folder_into(self, self.entry_new_path)
 
     def get_clone_info(self):
         return {"new_name": self.entry_new_name.get_text(), "new_path": self.entry_new_path.get_text()}
@@ -835,6 +1081,7 @@ class VMCloneDialog(Gtk.Dialog):
 class ManageSnapshotsDialog(Gtk.Dialog):
     def __init__(self, parent, vm):
         super().__init__(title=f"Manage Snapshots for {vm['name']}", transient_for=parent)
+        self.set_modal(True)
         self.set_default_size(600, 400)
         self.set_resizable(True)
         self.vm = vm
@@ -892,16 +1139,9 @@ class ManageSnapshotsDialog(Gtk.Dialog):
 
     def handle_operation(self, operation_func, *args):
         progress = ProgressDialog(self, "Processing Snapshot...")
+        progress.start_pulse("Processing...")
         def task_thread():
-            def pulse_loop():
-                while not stop_pulse:
-                    GLib.idle_add(progress.pulse, "Processing...")
-                    time.sleep(0.2)
-            stop_pulse = False
-            pulse_thread = threading.Thread(target=pulse_loop, daemon=True)
-            pulse_thread.start()
             success, message = operation_func(*args)
-            stop_pulse = True
             GLib.idle_add(progress.destroy)
             if success:
                 GLib.idle_add(show_info_dialog, "Success", message, self)
@@ -909,7 +1149,6 @@ class ManageSnapshotsDialog(Gtk.Dialog):
             else:
                 GLib.idle_add(show_detailed_error_dialog, "Snapshot Operation Failed", message, self)
         threading.Thread(target=task_thread, daemon=True).start()
-        progress.run()
 
     def on_create(self, button):
         snap_name = self.create_entry.get_text().strip()
@@ -922,19 +1161,63 @@ class ManageSnapshotsDialog(Gtk.Dialog):
 
     def on_delete_clicked(self, button, snap):
         d = Gtk.MessageDialog(transient_for=self, flags=0, message_type=Gtk.MessageType.QUESTION, buttons=Gtk.ButtonsType.YES_NO, text=f"Delete snapshot '{snap}'?")
-        if d.run() == Gtk.ResponseType.YES:
-            self.handle_operation(delete_snapshot_cmd, self.vm, snap)
+        d.set_modal(True)
+        d.connect("response", self.on_delete_response, snap)
+        d.show()
+
+    def on_delete_response(self, d, response, snap):
         d.destroy()
+        if response == Gtk.ResponseType.YES:
+            self.handle_operation(delete_snapshot_cmd, self.vm, snap)
 
 class QEMUManagerMain(Gtk.Window):
+    css_loaded = False
+
     def __init__(self):
         super().__init__(title="Nicos Qemu GUI")
         self.set_default_size(1000, 700)
         self.set_resizable(True)
         self.vm_processes = {}
-        self.vm_configs = load_all_vm_configs()
+        self.qmp_clients = {}
+        self.launch_cmds = {}
+        self.vm_rows = {}
+        self.dir_monitors = {}
+        self.pending_reloads = set()
+        self.index_save_id = None
+        self.configs_loaded = False
+        self.vm_configs = {}
+        self.vm_index = {}
+        self.removed_paths = set()
         self.build_ui()
         self.apply_css()
+        self.connect("destroy", lambda w: self.flush_vm_index())
+        def load_thread():
+            configs, index = [], []
+            try:
+                configs, index = load_all_vm_configs()
+            except (OSError, ValueError, TypeError) as e:
+                GLib.idle_add(show_detailed_error_dialog, f"Error loading Virtual Machines: {e}", str(e), self)
+                logging.error(f"Error loading VM configs: {e}")
+            finally:
+                GLib.idle_add(self.on_configs_loaded, configs, index)
+        threading.Thread(target=load_thread, daemon=True).start()
+
+    def on_configs_loaded(self, configs, index):
+        # Directories deleted while loading must not come back from the old index.
+        removed = [p for p in index if p in self.removed_paths]
+        index = [p for p in index if p not in self.removed_paths]
+        configs = [vm for vm in configs if vm["path"] not in self.removed_paths]
+        self.removed_paths.clear()
+        added = [p for p in self.vm_index if p not in index]
+        self.vm_configs = {**{vm_key(vm): vm for vm in configs}, **self.vm_configs}
+        self.vm_index = {**dict.fromkeys(index), **self.vm_index}
+        self.configs_loaded = True
+        self.refresh_vm_list()
+        for p in self.vm_index:
+            self.watch_vm_dir(p)
+        if added or removed:
+            self.schedule_vm_index_save()
+        return False
 
     def build_ui(self):
         vbox = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=10)
@@ -949,132 +1232,392 @@ class QEMUManagerMain(Gtk.Window):
         btn_add.set_tooltip_text("Create a new virtual machine")
         btn_add.connect("clicked", self.on_add_vm)
         header.pack_end(btn_add)
+        btn_redetect = Gtk.Button.new_from_icon_name("view-refresh-symbolic", Gtk.IconSize.BUTTON)
+        btn_redetect.set_tooltip_text("Re-detect QEMU, swtpm and OVMF")
+        btn_redetect.connect("clicked", self.on_redetect_clicked)
+        header.pack_start(btn_redetect)
         self.listbox = Gtk.ListBox()
         self.listbox.set_selection_mode(Gtk.SelectionMode.NONE)
+        self.listbox.set_sort_func(self.sort_vm_rows)
+        self.listbox.set_activate_on_single_click(False)
+        self.listbox.connect("row-activated", self.on_vm_row_activated)
+        self.listbox.connect("button-press-event", self.on_listbox_button_press)
         scrolled = Gtk.ScrolledWindow()
+        scrolled.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
         scrolled.add(self.listbox)
         vbox.pack_start(scrolled, True, True, 0)
         self.add(vbox)
+        self.context_vm = None
+        self.context_menu = self.create_context_menu()
+        self.context_menu.attach_to_widget(self.listbox, None)
         self.refresh_vm_list()
 
     def apply_css(self):
-        css = b"""
-        window { background-color: #1e1e2e; }
-        .vm-item { background-color: #2c2c3c; border-radius: 8px; padding: 12px; margin: 4px; color: #ffffff; box-shadow: 0 2px 4px rgba(0,0,0,0.2); }
-        .round-button { border-radius: 50%; padding: 4px; background-color: transparent; }
-        .iso-drop-area { background-color: #3b3b4b; border: 2px dashed #ffffff; }
-        .snapshot-button { background-color: #3b3b4b; color: #ffffff; border-radius: 4px; padding: 4px 8px; }
-        .snapshot-button:hover { background-color: #4c4c5c; }
-        """
+        if QEMUManagerMain.css_loaded:
+            return
         sp = Gtk.CssProvider()
-        sp.load_from_data(css)
+        sp.load_from_data(CSS)
         Gtk.StyleContext.add_provider_for_screen(Gdk.Screen.get_default(), sp, Gtk.STYLE_PROVIDER_PRIORITY_USER)
+        QEMUManagerMain.css_loaded = True
 
     def on_add_vm(self, w):
         d = ISOSelectDialog(self)
         d.show_all()
 
+    def on_redetect_clicked(self, w):
+        redetect_host_tools()
+        self.launch_cmds.clear()
+        qemu = which("qemu-system-x86_64") or "not found"
+        ovmf = find_ovmf_source_dir() or "not found"
+        swtpm = which("swtpm") or "not found"
+        show_info_dialog("Host tools re-detected.", GLib.markup_escape_text(f"QEMU: {qemu}\nOVMF: {ovmf}\nswtpm: {swtpm}"), self)
+
+    def on_create_response(self, dialog, response):
+        config = dialog.get_vm_config() if response == Gtk.ResponseType.OK else None
+        dialog.destroy()
+        if config:
+            self.create_vm(config)
+
+    def create_vm(self, config):
+        progress = ProgressDialog(self, f"Creating {config['name']}...")
+        progress.start_pulse("Preparing disk and firmware...")
+        def create_thread():
+            try:
+                if prepare_vm_files(config, self):
+                    GLib.idle_add(self.add_vm, config)
+            except OSError as e:
+                GLib.idle_add(show_detailed_error_dialog, f"Error creating Virtual Machine: {e}", str(e), self)
+                logging.error(f"Error creating VM {config['name']}: {e}")
+            finally:
+                GLib.idle_add(progress.destroy)
+        threading.Thread(target=create_thread, daemon=True).start()
+
     def add_vm(self, config):
         if config is None:
             return
         save_vm_config(config)
-        index = load_vm_index()
-        if config["path"] not in index:
-            index.append(config["path"])
-            save_vm_index(index)
-        self.vm_configs = load_all_vm_configs()
-        self.refresh_vm_list()
+        if config["path"] not in self.vm_index:
+            self.vm_index[config["path"]] = None
+            self.schedule_vm_index_save()
+        self.watch_vm_dir(config["path"])
+        self.store_vm_config(config)
+
+    def store_vm_config(self, config, old=None):
+        old_key = vm_key(old or config)
+        self.vm_configs.pop(old_key, None)
+        self.vm_configs[vm_key(config)] = config
+        row = self.vm_rows.pop(old_key, None)
+        if row:
+            row.vm = config
+            row.label.set_text(config["name"])
+            row.changed()
+        else:
+            row = self.create_vm_row(config)
+            row.show_all()
+            self.listbox.add(row)
+        self.vm_rows[vm_key(config)] = row
+
+    def remove_vm_dir(self, path):
+        if not self.configs_loaded:
+            self.removed_paths.add(path)
+        if path in self.vm_index:
+            del self.vm_index[path]
+            self.schedule_vm_index_save()
+        self.unwatch_vm_dir(path)
+        for key in [key for key in self.vm_configs if key[0] == path]:
+            del self.vm_configs[key]
+            self.launch_cmds.pop(key, None)
+        for key in [key for key in self.vm_rows if key[0] == path]:
+            self.listbox.remove(self.vm_rows.pop(key))
+
+    def schedule_vm_index_save(self):
+        if self.index_save_id is None and self.configs_loaded:
+            self.index_save_id = GLib.timeout_add(250, self.on_vm_index_save_timeout)
+
+    def on_vm_index_save_timeout(self):
+        self.index_save_id = None
+        save_vm_index(list(self.vm_index))
+        return False
 
-    def refresh_vm_list(self):
-        for row in self.listbox.get_children():
+    def flush_vm_index(self):
+        if self.index_save_id is not None:
+            GLib.source_remove(self.index_save_id)
+            self.on_vm_index_save_timeout()
+
+    def remove_vm_row(self, key):
+        self.vm_configs.pop(key, None)
+        self.launch_cmds.pop(key, None)
+        row = self.vm_rows.pop(key, None)
+        if row:
             self.listbox.remove(row)
-        self.vm_configs.sort(key=lambda x: x.get('name', '').lower())
-        for vm in self.vm_configs:
-            row = self.create_vm_row(vm)
-            self.listbox.add(row)
-        self.listbox.show_all()
+
+    def watch_vm_dir(self, path):
+        if path in self.dir_monitors:
+            return
+        try:
+            monitor = Gio.File.new_for_path(path).monitor_directory(Gio.FileMonitorFlags.NONE, None)
+        except GLib.Error as e:
+            logging.warning(f"Cannot watch {path}: {e}")
+            return
+        monitor.connect("changed", self.on_vm_dir_changed, path)
+        self.dir_monitors[path] = monitor
+
+    def unwatch_vm_dir(self, path):
+        monitor = self.dir_monitors.pop(path, None)
+        if monitor:
+            monitor.cancel()
+
+    def on_vm_dir_changed(self, monitor, changed_file, other_file, event_type, path):
+        if not changed_file.get_basename().endswith(".json"):
+            return
+        if event_type not in (Gio.FileMonitorEvent.CHANGES_DONE_HINT, Gio.FileMonitorEvent.DELETED):
+            return
+        if not self.pending_reloads:
+            GLib.idle_add(self.reload_changed_vm_dirs)
+        self.pending_reloads.add(path)
+
+    def reload_changed_vm_dirs(self):
+        paths = self.pending_reloads
+        self.pending_reloads = set()
+        for p in paths:
+            configs = {vm_key(vm): vm for vm in load_vm_dir_configs(p)}
+            for key in [key for key in self.vm_rows if key[0] == p and key not in configs]:
+                self.remove_vm_row(key)
+            for key, vm in configs.items():
+                row = self.vm_rows.get(key)
+                if row is None or row.vm is not vm:
+                    self.store_vm_config(vm)
+        return False
+
+    def refresh_vm_list(self):
+        bulk = not self.vm_rows
+        if bulk:
+            self.listbox.set_visible(False)
+        self.listbox.freeze_child_notify()
+        for key in [key for key in self.vm_rows if key not in self.vm_configs]:
+            self.listbox.remove(self.vm_rows.pop(key))
+        for key, vm in self.vm_configs.items():
+            row = self.vm_rows.get(key)
+            if row is None:
+                row = self.create_vm_row(vm)
+                row.show_all()
+                self.listbox.add(row)
+                self.vm_rows[key] = row
+            elif row.vm is not vm:
+                row.vm = vm
+                row.label.set_text(vm["name"])
+                row.changed()
+        self.listbox.thaw_child_notify()
+        if bulk:
+            self.listbox.set_visible(True)
+
+    def sort_vm_rows(self, row1, row2):
+        name1 = row1.vm["name"].lower()
+        name2 = row2.vm["name"].lower()
+        return (name1 > name2) - (name1 < name2)
 
     def create_vm_row(self, vm):
         row = Gtk.ListBoxRow()
-        event_box = Gtk.EventBox()
+        row.vm = vm
         hbox = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
         hbox.get_style_context().add_class("vm-item")
-        label = Gtk.Label(label=vm["name"], xalign=0.0)
-        hbox.pack_start(label, True, True, 0)
-        play_btn = Gtk.Button()
-        play_btn.set_relief(Gtk.ReliefStyle.NONE)
-        play_img = Gtk.Image.new_from_icon_name("media-playback-start", Gtk.IconSize.BUTTON)
-        play_btn.set_image(play_img)
-        play_btn.get_style_context().add_class("round-button")
-        play_btn.set_tooltip_text("Start virtual machine")
-        play_btn.connect("clicked", lambda b, v=vm: self.start_vm(v))
-        settings_btn = Gtk.Button()
-        settings_btn.set_relief(Gtk.ReliefStyle.NONE)
-        set_img = Gtk.Image.new_from_icon_name("preferences-system", Gtk.IconSize.BUTTON)
-        settings_btn.set_image(set_img)
-        settings_btn.get_style_context().add_class("round-button")
-        settings_btn.set_tooltip_text("Edit VM settings")
-        settings_btn.connect("clicked", lambda b, v=vm: self.edit_vm(v))
+        row.label = Gtk.Label(label=vm["name"], xalign=0.0)
+        hbox.pack_start(row.label, True, True, 0)
+        play_btn = self.create_row_button("media-playback-start", "Start virtual machine", lambda b, r=row: self.start_vm(r.vm))
+        settings_btn = self.create_row_button("preferences-system", "Edit VM settings", lambda b, r=row: self.edit_vm(r.vm))
         hbox.pack_end(settings_btn, False, False, 0)
         hbox.pack_end(play_btn, False, False, 0)
-        event_box.add(hbox)
-        event_box.connect("button-press-event", self.on_vm_item_event, vm)
-        row.add(event_box)
+        row.add(hbox)
         return row
 
-    def on_vm_item_event(self, widget, event, vm):
-        if event.type == Gdk.EventType._2BUTTON_PRESS and event.button == 1:
-            self.start_vm(vm)
-            return True
-        if event.button == 3:
-            menu = self.create_context_menu(vm)
-            menu.popup_at_pointer(event)
-            return True
-        return False
+    def create_row_button(self, icon_name, tooltip, callback):
+        btn = Gtk.Button.new_from_icon_name(icon_name, Gtk.IconSize.BUTTON)
+        btn.get_style_context().add_class("round-button")
+        btn.set_tooltip_text(tooltip)
+        btn.connect("clicked", callback)
+        return btn
+
+    def on_vm_row_activated(self, listbox, row):
+        self.start_vm(row.vm)
+
+    def on_listbox_button_press(self, listbox, event):
+        if event.button != 3:
+            return False
+        # Clicks on the row buttons bubble up with button-relative coordinates.
+        widget = Gtk.get_event_widget(event)
+        row = widget.get_ancestor(Gtk.ListBoxRow) if widget else None
+        if row is None:
+            return False
+        self.context_vm = row.vm
+        self.context_menu.popup_at_pointer(event)
+        return True
 
-    def create_context_menu(self, vm):
+    def create_context_menu(self):
         menu = Gtk.Menu()
-        items = {"Start": self.start_vm, "Edit": self.edit_vm,
+        items = {"Start": self.start_vm, "Suspend": self.suspend_vm, "Edit": self.edit_vm,
                  "Manage Snapshots": self.open_manage_snapshots, "Clone": self.clone_vm,
                  "Delete": self.delete_vm}
         for label, func in items.items():
             item = Gtk.MenuItem(label=label)
-            item.connect("activate", lambda w, v=vm, f=func: f(v))
+            item.connect("activate", lambda w, f=func: f(self.context_vm))
             menu.append(item)
+        power_menu = Gtk.Menu()
+        for label, command in POWER_ACTIONS.items():
+            item = Gtk.MenuItem(label=label)
+            item.connect("activate", lambda w, c=command: self.power_action(self.context_vm, c))
+            power_menu.append(item)
+        power_item = Gtk.MenuItem(label="Power")
+        power_item.set_submenu(power_menu)
+        menu.insert(power_item, 1)
         menu.show_all()
         return menu
 
     def open_manage_snapshots(self, vm):
-        if vm.get("disk_type") != "qcow2":
+        if vm["disk_type"] != "qcow2":
             show_detailed_error_dialog("Snapshots not supported", "Snapshots are only available for 'qcow2' disk images.", self)
             return
         dlg = ManageSnapshotsDialog(self, vm)
-        dlg.run()
-        dlg.destroy()
+        dlg.connect("response", lambda d, response: d.destroy())
 
     def start_vm(self, vm):
-        if not vm.get("launch_cmd"):
-            show_detailed_error_dialog("No start command!", "Launch command is missing or invalid. Please check VM settings.", self)
+        key = vm_key(vm)
+        if key in self.vm_processes:
+            show_info_dialog("Virtual Machine already running.", f"{vm['name']} is already running.", self)
+            return
+        # Edits and reloads replace the config object, which invalidates the entry.
+        cached = self.launch_cmds.get(key)
+        launch_cmd = cached[1] if cached and cached[0] is vm else build_launch_command(vm)
+        if not launch_cmd:
             logging.error(f"No launch command for VM {vm['name']}")
             return
+        self.launch_cmds[key] = (vm, launch_cmd)
         if not validate_vm_config(vm):
             return
+        if not fast_resume_supported(vm):
+            self.launch_vm(vm, launch_cmd, False)
+            return
+        # Reserve the slot while qemu-img looks for a saved state off the main loop.
+        self.vm_processes[key] = None
+        def probe_thread():
+            resume = False
+            try:
+                resume = RESUME_SNAPSHOT in list_snapshots(vm)
+            except OSError as e:
+                logging.error(f"Could not look for a saved state of VM {vm['name']}: {e}")
+            finally:
+                GLib.idle_add(self.launch_vm, vm, launch_cmd, resume)
+        threading.Thread(target=probe_thread, daemon=True).start()
+
+    def launch_vm(self, vm, launch_cmd, resume):
+        key = vm_key(vm)
+        qmp = self.qmp_client(vm)
+        cmd = [*launch_cmd, "-qmp", f"unix:{qmp.sock_path},server=on,wait=off"]
+        if resume:
+            cmd += ["-loadvm", RESUME_SNAPSHOT]
         try:
-            proc = subprocess.Popen(vm["launch_cmd"])
-            self.vm_processes[vm['name']] = proc
+            if vm["tpm_enabled"]:
+                start_swtpm(vm)
+            with open(LOG_FILE, "ab") as log:
+                proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=log, start_new_session=True)
+            self.vm_processes[key] = proc
+            GLib.child_watch_add(GLib.PRIORITY_DEFAULT, proc.pid, self.on_vm_exited, key)
             logging.info(f"Started VM {vm['name']} with PID {proc.pid}")
-        except (OSError, FileNotFoundError) as e:
+        except (OSError, subprocess.CalledProcessError) as e:
+            self.vm_processes.pop(key, None)
             show_detailed_error_dialog(f"Error starting Virtual Machine: {e}", str(e), self)
             logging.error(f"Error starting VM {vm['name']}: {e}")
+            return
+        if resume:
+            threading.Thread(target=self.drop_resume_snapshot, args=(vm, qmp, proc), daemon=True).start()
+
+    def qmp_client(self, vm):
+        key = vm_key(vm)
+        client = self.qmp_clients.get(key)
+        if client is None:
+            client = self.qmp_clients[key] = QMPClient(qmp_socket_path(vm))
+        return client
+
+    def power_action(self, vm, command):
+        if not self.vm_processes.get(vm_key(vm)):
+            show_info_dialog("Virtual Machine not running.", f"{vm['name']} was not started from this window.", self)
+            return
+        qmp = self.qmp_client(vm)
+        def power_thread():
+            try:
+                qmp.execute(command)
+                logging.info(f"Sent {command} to VM {vm['name']}")
+            except (OSError, RuntimeError, ValueError) as e:
+                GLib.idle_add(show_detailed_error_dialog, f"Error controlling Virtual Machine: {e}", str(e), self)
+                logging.error(f"Error sending {command} to VM {vm['name']}: {e}")
+        threading.Thread(target=power_thread, daemon=True).start()
+
+    def drop_resume_snapshot(self, vm, qmp, proc):
+        # The saved state must not be loaded again once the disk has moved on.
+        for _ in range(60):
+            if proc.poll() is not None:
+                return
+            try:
+                qmp.hmp(f"delvm {RESUME_SNAPSHOT}")
+                logging.info(f"Resumed VM {vm['name']} from saved state")
+                return
+            except (FileNotFoundError, ConnectionRefusedError):
+                time.sleep(0.5)
+            except (OSError, RuntimeError, ValueError) as e:
+                logging.error(f"Could not drop resume state of VM {vm['name']}: {e}")
+                return
+        logging.error(f"Could not reach QMP socket of VM {vm['name']} to drop its resume state")
+
+    def suspend_vm(self, vm):
+        if not fast_resume_supported(vm):
+            show_detailed_error_dialog("Fast resume not available.", "Enable Fast Resume in the VM settings. It needs a qcow2 disk and BIOS firmware.", self)
+            return
+        if not self.vm_processes.get(vm_key(vm)):
+            show_info_dialog("Virtual Machine not running.", f"{vm['name']} was not started from this window.", self)
+            return
+        qmp = self.qmp_client(vm)
+        progress = ProgressDialog(self, f"Suspending {vm['name']}...")
+        progress.start_pulse("Saving VM state...")
+        def suspend_thread():
+            try:
+                qmp.execute("stop")
+                try:
+                    qmp.hmp(f"savevm {RESUME_SNAPSHOT}")
+                except (OSError, RuntimeError, ValueError):
+                    qmp.execute("cont")
+                    raise
+                qmp.execute("quit")
+                logging.info(f"Suspended VM {vm['name']}")
+            except (OSError, RuntimeError, ValueError) as e:
+                GLib.idle_add(show_detailed_error_dialog, f"Error suspending VM: {e}", str(e), self)
+                logging.error(f"Error suspending VM {vm['name']}: {e}")
+            finally:
+                GLib.idle_add(progress.destroy)
+        threading.Thread(target=suspend_thread, daemon=True).start()
+
+    def on_vm_exited(self, pid, status, key):
+        _, name = key
+        proc = self.vm_processes.get(key)
+        if proc and proc.pid == pid:
+            del self.vm_processes[key]
+            qmp = self.qmp_clients.pop(key, None)
+            if qmp:
+                qmp.close()
+        code = os.waitstatus_to_exitcode(status)
+        if code:
+            logging.warning(f"VM {name} (PID {pid}) exited with status {code}")
+        else:
+            logging.info(f"VM {name} (PID {pid}) exited")
 
     def edit_vm(self, vm):
         dialog = VMSettingsDialog(self, vm)
-        if dialog.run() == Gtk.ResponseType.OK:
+        dialog.connect("response", self.on_edit_response, vm)
+
+    def on_edit_response(self, dialog, response, vm):
+        if response == Gtk.ResponseType.OK:
             updated_config = dialog.get_updated_config()
             if updated_config:
                 save_vm_config(updated_config)
-                self.vm_configs = load_all_vm_configs()
-                self.refresh_vm_list()
+                self.store_vm_config(updated_config, vm)
         dialog.destroy()
 
     def delete_vm(self, vm):
@@ -1086,7 +1629,11 @@ class QEMUManagerMain(Gtk.Window):
             text=f"Delete '{vm['name']}'?"
         )
         dialog.format_secondary_markup("This will permanently delete the VM's configuration, disk image, and associated files. This action cannot be undone.")
-        response = dialog.run()
+        dialog.set_modal(True)
+        dialog.connect("response", self.on_delete_response, vm)
+        dialog.show()
+
+    def on_delete_response(self, dialog, response, vm):
         dialog.destroy()
         if response != Gtk.ResponseType.YES:
             return
@@ -1095,87 +1642,78 @@ class QEMUManagerMain(Gtk.Window):
         def delete_thread():
             try:
                 vm_path = vm["path"]
+                forget_dirs(vm_path)
                 if os.path.exists(vm_path):
                     shutil.rmtree(vm_path)
                     GLib.idle_add(progress.update, 0.5, "Deleted VM directory")
-                index = load_vm_index()
-                if vm_path in index:
-                    index.remove(vm_path)
-                    save_vm_index(index)
+                GLib.idle_add(self.remove_vm_dir, vm_path)
                 GLib.idle_add(progress.update, 1.0, "Updated VM index")
-                self.vm_configs = load_all_vm_configs()
-                GLib.idle_add(self.refresh_vm_list)
             except OSError as e:
                 GLib.idle_add(show_detailed_error_dialog, f"Error deleting VM: {e}", str(e), self)
                 logging.error(f"Error deleting VM {vm['name']}: {e}")
             finally:
                 GLib.idle_add(progress.destroy)
         threading.Thread(target=delete_thread, daemon=True).start()
-        progress.run()
 
     def clone_vm(self, vm):
-        clone_dialog = VMCloneDialog(self, vm)
-        if clone_dialog.run() == Gtk.ResponseType.OK:
-            clone_info = clone_dialog.get_clone_info()
-            if not clone_info or not clone_info["new_name"] or not clone_info["new_path"]:
-                show_detailed_error_dialog("Invalid Clone Info", "New name and path cannot be empty.", self)
-                clone_dialog.destroy()
-                return
+        clone_dialog = VMCloneDialog(self, vm, {name for _, name in self.vm_rows})
+        clone_dialog.connect("response", self.on_clone_response, vm)
 
-            progress = ProgressDialog(self, f"Cloning {vm['name']}...")
-            def clone_thread():
-                new_vm_name = clone_info["new_name"]
-                new_vm_path = clone_info["new_path"]
+    def on_clone_response(self, clone_dialog, response, vm):
+        clone_info = clone_dialog.get_clone_info()
+        clone_dialog.destroy()
+        if response != Gtk.ResponseType.OK:
+            return
+        if not clone_info or not clone_info["new_name"] or not clone_info["new_path"]:
+            show_detailed_error_dialog("Invalid Clone Info", "New name and path cannot be empty.", self)
+            return
+        if (clone_info["new_path"], clone_info["new_name"]) in self.vm_configs or os.path.exists(f"{clone_info['new_path']}/{clone_info['new_name']}.json"):
+            show_detailed_error_dialog("Virtual Machine already exists.", f"{clone_info['new_name']} already exists in {clone_info['new_path']}.", self)
+            return
+
+        progress = ProgressDialog(self, f"Cloning {vm['name']}...")
+        def clone_thread():
+            new_vm_name = clone_info["new_name"]
+            new_vm_path = clone_info["new_path"]
+            last_percent = -1
+            def on_copy_progress(copied, size):
+                nonlocal last_percent
+                percent = copied * 100 // size if size else 100
+                if percent != last_percent:
+                    last_percent = percent
+                    GLib.idle_add(progress.update, percent / 100, f"{percent}%")
+            try:
                 if re.search(r'[<>:"/\\|?*]', new_vm_name):
                     GLib.idle_add(show_detailed_error_dialog, "Invalid clone name.", "Name cannot contain special characters.", self)
-                    GLib.idle_add(progress.destroy)
                     return
                 os.makedirs(new_vm_path, exist_ok=True)
                 if not os.access(new_vm_path, os.W_OK):
                     GLib.idle_add(show_detailed_error_dialog, "Invalid clone directory.", "Directory is not writable.", self)
-                    GLib.idle_add(progress.destroy)
                     return
 
                 new_vm_config = vm.copy()
                 new_vm_config["name"] = new_vm_name
                 new_vm_config["path"] = new_vm_path
-                new_vm_config["disk_image"] = os.path.join(new_vm_path, f"{new_vm_name}.img")
-                try:
-                    source_size = os.path.getsize(vm["disk_image"])
-                    copied = 0
-                    with open(vm["disk_image"], 'rb') as fsrc, open(new_vm_config["disk_image"], 'wb') as fdst:
-                        while True:
-                            buf = fsrc.read(4 * 1024 * 1024)
-                            if not buf:
-                                break
-                            fdst.write(buf)
-                            copied += len(buf)
-                            fraction = copied / source_size
-                            GLib.idle_add(progress.update, fraction, f"{int(fraction*100)}%")
-
-                    if vm["firmware"] in ["UEFI", "UEFI+Secure Boot"]:
-                        copy_uefi_files(new_vm_config, self)
-
-                    new_vm_config["launch_cmd"] = build_launch_command(new_vm_config)
-                    save_vm_config(new_vm_config)
-
-                    index = load_vm_index()
-                    if new_vm_path not in index:
-                        index.append(new_vm_path)
-                        save_vm_index(index)
-
-                    GLib.idle_add(self.add_vm, new_vm_config)
-                except (OSError, subprocess.CalledProcessError) as e:
-                    GLib.idle_add(show_detailed_error_dialog, f"Error cloning VM: {e}", str(e), self)
-                finally:
-                    GLib.idle_add(progress.destroy)
-
-            threading.Thread(target=clone_thread, daemon=True).start()
-            progress.run()
-        clone_dialog.destroy()
+                new_vm_config["disk_image"] = f"{new_vm_path}/{new_vm_name}.img"
+                fast_copy(vm["disk_image"], new_vm_config["disk_image"], on_copy_progress)
 
-if __name__ == "__main__":
+                if vm["firmware"] in ["UEFI", "UEFI+Secure Boot"]:
+                    copy_uefi_files(new_vm_config, self)
+
+                GLib.idle_add(self.add_vm, new_vm_config)
+            except (OSError, subprocess.CalledProcessError) as e:
+                GLib.idle_add(show_detailed_error_dialog, f"Error cloning VM: {e}", str(e), self)
+                logging.error(f"Error cloning VM {vm['name']}: {e}")
+            finally:
+                GLib.idle_add(progress.destroy)
+
+        threading.Thread(target=clone_thread, daemon=True).start()
+
+def main():
     win = QEMUManagerMain()
     win.connect("destroy", Gtk.main_quit)
     win.show_all()
     Gtk.main()
+
+if __name__ == "__main__":
+    main()